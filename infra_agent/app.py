@@ -1,10 +1,12 @@
 import json
 import logging
+from contextlib import asynccontextmanager
 
-from fastapi import Depends, FastAPI, Request, Response
+from fastapi import Depends, FastAPI, HTTPException, Request, Response
 
 from infra_agent.models.grafana import GrafanaWebhookPayload
-from infra_agent.settings import settings
+from infra_agent.providers._client import close_httpx
+from infra_agent.settings import get_settings
 from infra_agent.workers.ai import gpt_query
 
 
@@ -21,7 +23,14 @@ class EndpointFilter(logging.Filter):
 logger = logging.getLogger("uvicorn.access")
 logger.addFilter(EndpointFilter())
 
-app = FastAPI()
+
+@asynccontextmanager
+async def lifespan(_: FastAPI):
+    yield
+    await close_httpx()
+
+
+app = FastAPI(lifespan=lifespan)
 
 
 async def get_body(request: Request):
@@ -41,10 +50,11 @@ async def readiness() -> Response:
 
 @app.post("/webhooks/grafana")
 async def grafana_webhook(payload: GrafanaWebhookPayload) -> Response:
+    settings = get_settings()
     alert_summaries = payload.model_dump(exclude_none=True)
 
     prompt = settings.GRAFANA_WEBHOOK_PROMPT_FORMAT
-    system_prompt = settings.GRAFANA_WEBHOOK_SYSTEM_PROMPT_FORMAT
+    system_prompt = settings.GRAFANA_WEBHOOK_SYSTEM_PROMPT_TEMPLATE
 
     messages = []
     result = await gpt_query(
@@ -62,9 +72,9 @@ async def grafana_webhook(payload: GrafanaWebhookPayload) -> Response:
     )
 
 
-if settings.DEBUG:
-
-    @app.post("/debug")
-    def input_request(data: str = Depends(get_body)):
-        print(data)
-        return Response("{}", status_code=200)
+@app.post("/debug", include_in_schema=False)
+def input_request(data: str = Depends(get_body)):
+    if not get_settings().DEBUG:
+        raise HTTPException(status_code=404)
+    print(data)
+    return Response("{}", status_code=200)
@@ -3,12 +3,13 @@ import logging
 import uvicorn
 from uvicorn.config import LOGGING_CONFIG
 
-from infra_agent.settings import settings
+from infra_agent.settings import get_settings
 
 logger = logging.getLogger(__name__)
 
 
 def serve():
+    settings = get_settings()
     kwargs = {}
     if settings.DEBUG:
         kwargs["reload"] = True
@@ -1,11 +1,6 @@
 from typing import List, Optional
 
-import gitlab
-
 from infra_agent.models.generic import InfraAgentBaseModel
-from infra_agent.settings import settings
-
-gl = gitlab.Gitlab(str(settings.GITLAB_URL), private_token=settings.GITLAB_TOKEN)
 
 
 class GitlabMergeRequest(InfraAgentBaseModel):
@@ -60,6 +55,7 @@ class GitlabRepository(InfraAgentBaseModel):
 class GitlabFile(InfraAgentBaseModel):
     file_path: str
     file_name: str
+    type: Optional[str] = None
     size: Optional[int] = None
     encoding: Optional[str] = None
     content: Optional[str] = None
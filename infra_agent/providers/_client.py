@@ -0,0 +1,55 @@
+from __future__ import annotations
+
+from functools import lru_cache
+from typing import TYPE_CHECKING
+
+import httpx
+
+from infra_agent.settings import get_settings
+
+if TYPE_CHECKING:
+    import gitlab
+
+
+@lru_cache(maxsize=1)
+def get_gl() -> gitlab.Gitlab:
+    """Return the shared GitLab client, created on first use.
+
+    python-gitlab and requests are imported here, so importing the app doesn't pay for them up front.
+    """
+    import gitlab
+    import requests
+    from requests.adapters import HTTPAdapter
+    from urllib3.util.retry import Retry
+
+    settings = get_settings()
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=32, pool_maxsize=64, max_retries=Retry(total=3, backoff_factor=0.2))
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return gitlab.Gitlab(str(settings.GITLAB_URL), private_token=settings.GITLAB_TOKEN, session=session)
+
+
+@lru_cache(maxsize=1)
+def get_httpx() -> httpx.AsyncClient:
+    """Return the shared async client for hot GitLab API endpoints, rooted at `<GITLAB_URL>/api`."""
+    settings = get_settings()
+    return httpx.AsyncClient(
+        base_url=f"{str(settings.GITLAB_URL).rstrip('/')}/api",
+        headers={"PRIVATE-TOKEN": settings.GITLAB_TOKEN},
+        transport=httpx.AsyncHTTPTransport(
+            retries=3,
+            limits=httpx.Limits(
+                max_connections=settings.GITLAB_CONCURRENCY, max_keepalive_connections=settings.GITLAB_CONCURRENCY
+            ),
+        ),
+        # requests queue for a free connection as long as needed, i.e. during large file fan-outs
+        timeout=httpx.Timeout(60.0, pool=None),
+    )
+
+
+async def close_httpx() -> None:
+    """Close the shared async client, if it was ever created."""
+    if get_httpx.cache_info().currsize:
+        await get_httpx().aclose()
+        get_httpx.cache_clear()
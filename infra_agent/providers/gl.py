@@ -1,7 +1,26 @@
+from __future__ import annotations
+
+import asyncio
+import base64
+import json
 import logging
-from typing import Dict, List
+import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache, partial, wraps
+from typing import (
+    TYPE_CHECKING,
+    Any,
+    AsyncIterator,
+    Awaitable,
+    Callable,
+    Dict,
+    Hashable,
+    Iterable,
+    List,
+)
+from urllib.parse import quote
 
-import gitlab
+import httpx
 
 from infra_agent.models.generic import PromptToolError
 from infra_agent.models.gl import (
@@ -10,111 +29,279 @@ from infra_agent.models.gl import (
     GitlabMergeRequest,
     GitlabMergeRequestList,
 )
-from infra_agent.settings import settings
+from infra_agent.providers._client import get_gl, get_httpx
+from infra_agent.settings import get_settings
 
-gl = gitlab.Gitlab(str(settings.GITLAB_URL), private_token=settings.GITLAB_TOKEN)
+if TYPE_CHECKING:
+    from gitlab.v4.objects import Project
 
 logger = logging.getLogger(__name__)
 
+_OPENED_MERGE_REQUESTS_QUERY = """
+query($fullPath: ID!, $after: String) {
+  project(fullPath: $fullPath) {
+    mergeRequests(state: opened, after: $after) {
+      pageInfo { hasNextPage endCursor }
+      nodes { id title description state targetBranch sourceBranch }
+    }
+  }
+}
+"""
+# metadata GitLab returns as headers when a file is requested with HEAD
+_FILE_METADATA_HEADERS = {
+    "file_path": "X-Gitlab-File-Path",
+    "file_name": "X-Gitlab-File-Name",
+    "size": "X-Gitlab-Size",
+    "encoding": "X-Gitlab-Encoding",
+    "blob_id": "X-Gitlab-Blob-Id",
+    "commit_id": "X-Gitlab-Commit-Id",
+    "last_commit_id": "X-Gitlab-Last-Commit-Id",
+    "execute_filemode": "X-Gitlab-Execute-Filemode",
+}
+# above this many files a single tree listing is cheaper than probing each path
+_EXISTENCE_PROBE_LIMIT = 50
+
+
+def _project() -> Project:
+    """Return a lazy handle to the helmfile project - no API call, only its managers are used."""
+    return get_gl().projects.get(get_settings().GITLAB_HELMFILE_PROJECT_PATH, lazy=True)
+
+
+@lru_cache(maxsize=1)
+def _executor() -> ThreadPoolExecutor:
+    # the pool size also caps in-flight requests, keeping us within GitLab API rate limits
+    return ThreadPoolExecutor(max_workers=get_settings().GITLAB_CONCURRENCY, thread_name_prefix="gitlab")
+
+
+async def _run(fn: Callable[..., Any], *args: Any, **kwargs: Any) -> Any:
+    """Run a blocking python-gitlab call in the GitLab thread pool."""
+    return await asyncio.get_running_loop().run_in_executor(_executor(), partial(fn, *args, **kwargs))
+
+
+def _async_ttl_cache(ttl: int, key: Callable[..., Awaitable[Hashable]]):
+    """Cache coroutine results for `ttl` seconds under `await key(*args, **kwargs)`.
+
+    Entries are stored as `key: (expiry, value)` in the `cache` dict exposed on the wrapper.
+    """
+
+    def decorator(fn: Callable[..., Awaitable[Any]]):
+        cache: dict[Hashable, tuple[float, Any]] = {}
+
+        @wraps(fn)
+        async def wrapper(*args, **kwargs):
+            cache_key = await key(*args, **kwargs)
+            now = time.monotonic()
+            entry = cache.get(cache_key)
+            if entry and entry[0] > now:
+                return entry[1]
+            value = await fn(*args, **kwargs)
+            for expired in [k for k, (expiry, _) in cache.items() if expiry <= now]:
+                del cache[expired]
+            cache[cache_key] = (now + ttl, value)
+            return value
+
+        wrapper.cache = cache
+        return wrapper
+
+    return decorator
+
+
+async def _tree_cache_key(branch: str, path: str = "") -> tuple[str, str, str]:
+    project = _project()
+    tip = await _run(project.commits.get, branch, stats=False)
+    return branch, path, tip.id
+
+
+def _invalidate_branch_cache(branch: str) -> None:
+    for cache in (list_files_in_branch.cache, list_file_paths_in_branch.cache):
+        for cache_key in [k for k in cache if k[0] == branch]:
+            cache.pop(cache_key, None)
+
+
+def _dump_json(obj: Any) -> bytes:
+    # compact, without \uXXXX escaping of non-ASCII text - smaller bodies and less work for the encoder
+    return json.dumps(obj, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+def _project_api_path(suffix: str) -> str:
+    return f"/v4/projects/{quote(get_settings().GITLAB_HELMFILE_PROJECT_PATH, safe='')}{suffix}"
+
+
+def _raise_for_status(resp: httpx.Response) -> None:
+    if resp.is_error:
+        raise RuntimeError(f"Query failed: {resp.status_code} {resp.text}")
+
+
+async def _iter_commit_body(payload: dict[str, Any], actions: Iterable[dict[str, Any]]) -> AsyncIterator[bytes]:
+    # payload is a non-empty dict, so dropping its closing brace leaves room to append "actions"
+    yield _dump_json(payload)[:-1] + b',"actions":['
+    for i, action in enumerate(actions):
+        yield (b"," if i else b"") + _dump_json(action)
+    yield b"]}"
+
+
+async def _create_commit(payload: dict[str, Any], actions: Iterable[dict[str, Any]]) -> dict[str, Any]:
+    """Create a commit, streaming `actions` into the request body one file at a time.
+
+    Avoids holding the whole serialized payload in memory, which python-gitlab does for large commits.
+    """
+    resp = await get_httpx().post(
+        _project_api_path("/repository/commits"),
+        content=_iter_commit_body(payload, actions),
+        headers={"Content-Type": "application/json"},
+    )
+    _raise_for_status(resp)
+    return resp.json()
+
+
+async def _list_tree(branch: str, path: str = "") -> List[dict[str, Any]]:
+    client = get_httpx()
+    resp = await client.get(
+        _project_api_path("/repository/tree"),
+        # GitLab defaults to 20 items per page; 100 is the maximum and cuts round-trips 5x
+        params={"path": path, "ref": branch, "recursive": True, "per_page": 100},
+    )
+    _raise_for_status(resp)
+    tree = resp.json()
+    while "next" in resp.links:
+        resp = await client.get(resp.links["next"]["url"])
+        _raise_for_status(resp)
+        tree.extend(resp.json())
+    return tree
+
+
+def _to_merge_request(attributes: dict[str, Any]) -> GitlabMergeRequest:
+    # GitLab's REST schema is fixed, so the response is trusted and validation is skipped
+    return GitlabMergeRequest.model_construct(
+        id=attributes["id"],
+        title=attributes["title"],
+        description=attributes["description"],
+        state=attributes.get("state", "opened"),
+        target_branch=attributes["target_branch"],
+        source_branch=attributes["source_branch"],
+    )
+
+
+async def _gql(query: str, variables: dict[str, Any]) -> dict[str, Any]:
+    resp = await get_httpx().post("/graphql", json={"query": query, "variables": variables})
+    _raise_for_status(resp)
+    result = resp.json()
+    if result.get("errors"):
+        raise RuntimeError(f"Query failed: {result['errors']}")
+    return result["data"]
+
 
 async def list_opened_merge_requests() -> GitlabMergeRequestList:
     """List opened merge requests for a project."""
-    project = gl.projects.get(settings.GITLAB_HELMFILE_PROJECT_PATH)
-    mrs = project.mergerequests.list(state="opened", all=True)
-    items = [
-        GitlabMergeRequest(
-            id=mr.id,
-            title=mr.title,
-            description=mr.description,
-            state=mr.state,
-            target_branch=mr.target_branch,
-            source_branch=mr.source_branch,
+    items = []
+    variables = {"fullPath": get_settings().GITLAB_HELMFILE_PROJECT_PATH, "after": None}
+    while True:
+        data = await _gql(_OPENED_MERGE_REQUESTS_QUERY, variables)
+        mrs = data["project"]["mergeRequests"]
+        items.extend(
+            GitlabMergeRequest.model_construct(
+                # global ids come as "gid://gitlab/MergeRequest/<id>"
+                id=int(mr["id"].rsplit("/", 1)[-1]),
+                title=mr["title"],
+                description=mr["description"],
+                state=mr["state"],
+                target_branch=mr["targetBranch"],
+                source_branch=mr["sourceBranch"],
+            )
+            for mr in mrs["nodes"]
         )
-        for mr in mrs
-    ]
+        if not mrs["pageInfo"]["hasNextPage"]:
+            break
+        variables["after"] = mrs["pageInfo"]["endCursor"]
     return GitlabMergeRequestList(items=items)
 
 
 async def get_merge_request_details(mr_id: int) -> GitlabMergeRequest:
     """Get details of a merge request."""
-    project = gl.projects.get(settings.GITLAB_HELMFILE_PROJECT_PATH)
-    mr = project.mergerequests.get(mr_id)
-    return GitlabMergeRequest(
-        id=mr.id,
-        title=mr.title,
-        description=mr.description,
-        state=mr.state,
-        target_branch=mr.target_branch,
-        source_branch=mr.source_branch,
-    )
+    project = _project()
+    mr = await _run(project.mergerequests.get, mr_id)
+    return _to_merge_request(mr.attributes)
 
 
+@_async_ttl_cache(ttl=60, key=_tree_cache_key)
 async def list_files_in_branch(branch: str, path: str = "") -> List[GitlabFile]:
     """List files in repository for a given branch and path."""
-    project = gl.projects.get(settings.GITLAB_HELMFILE_PROJECT_PATH)
-    files = project.repository_tree(path=path, ref=branch, all=True, recursive=True)
-    result = []
-    for f in files:
-        result.append(
-            GitlabFile(
-                file_path=f.get("path", ""),
-                file_name=f.get("name", ""),
-                size=f.get("size", None),
-                encoding=None,
-                content=None,
-                ref=branch,
-                blob_id=f.get("id", None),
-                commit_id=None,
-                last_commit_id=None,
-                execute_filemode=f.get("mode", None) == "100755",
-            )
+    files = await _list_tree(branch, path)
+    return [
+        GitlabFile(
+            file_path=f.get("path", ""),
+            file_name=f.get("name", ""),
+            type=f.get("type", None),
+            size=f.get("size", None),
+            ref=branch,
+            blob_id=f.get("id", None),
+            execute_filemode=f.get("mode", None) == "100755",
         )
-    return result
+        for f in files
+    ]
+
+
+@_async_ttl_cache(ttl=60, key=_tree_cache_key)
+async def list_file_paths_in_branch(branch: str, path: str = "") -> set[str]:
+    """List paths of files in repository for a given branch and path, without building models."""
+    tree = await _list_tree(branch, path)
+    return {f["path"] for f in tree if f.get("type") == "blob"}
 
 
 async def update_file_and_push(branch: str, file_path: str, content: str, commit_message: str) -> GitlabCommit:
-    """Update a file in a branch and push."""
-    project = gl.projects.get(settings.GITLAB_HELMFILE_PROJECT_PATH)
-    file = project.files.get(file_path=file_path, ref=branch)
-    file.content = content
-    file.save(branch=branch, commit_message=commit_message)
-    commit = project.commits.list(ref_name=branch, per_page=1)[0]
-    return GitlabCommit(
-        id=commit.id,
-        short_id=commit.short_id,
-        title=commit.title,
-        message=commit.message,
-        author_name=commit.author_name,
-        author_email=commit.author_email,
-        authored_date=commit.authored_date,
-        committer_name=commit.committer_name,
-        committer_email=commit.committer_email,
-        committed_date=commit.committed_date,
-        parent_ids=commit.parent_ids,
-        web_url=commit.web_url,
+    """Update a file in a branch and push.
+
+    Prefer `update_files_and_push` when changing more than one file.
+    """
+    commit = await _create_commit(
+        {"branch": branch, "commit_message": commit_message},
+        [{"action": "update", "file_path": file_path, "content": content}],
+    )
+    _invalidate_branch_cache(branch)
+    return GitlabCommit.model_validate(commit)
+
+
+async def update_files_and_push(branch: str, files: dict[str, str], commit_message: str) -> GitlabCommit:
+    """Update or create several files in a branch and push them as a single commit."""
+    existing_files = await list_file_paths_in_branch(branch)
+    commit = await _create_commit(
+        {"branch": branch, "commit_message": commit_message},
+        (
+            {
+                "action": "update" if file_path in existing_files else "create",
+                "file_path": file_path,
+                "content": file_contents,
+            }
+            for file_path, file_contents in files.items()
+        ),
     )
+    _invalidate_branch_cache(branch)
+    return GitlabCommit.model_validate(commit)
 
 
 async def create_merge_request_from_branch(
     source_branch: str, target_branch: str, title: str, description: str
 ) -> GitlabMergeRequest:
     """Create a merge request from a branch."""
-    project = gl.projects.get(settings.GITLAB_HELMFILE_PROJECT_PATH)
-    mr = project.mergerequests.create(
+    project = _project()
+    mr = await _run(
+        project.mergerequests.create,
         {
             "source_branch": source_branch,
             "target_branch": target_branch,
             "title": title,
             "description": description,
-        }
-    )
-    return GitlabMergeRequest(
-        id=mr.id,
-        title=mr.title,
-        description=mr.description,
-        target_branch=mr.target_branch,
-        source_branch=mr.source_branch,
+        },
     )
+    return _to_merge_request(mr.attributes)
+
+
+async def _file_exists(path: str, ref: str) -> bool:
+    resp = await _afiles_head(path, ref)
+    if resp.status_code == 404:
+        return False
+    _raise_for_status(resp)
+    return True
 
 
 async def create_merge_request(
@@ -133,27 +320,30 @@ async def create_merge_request(
             },
         )
     mr_target_branch_name = "main"
-    project = gl.projects.get(settings.GITLAB_HELMFILE_PROJECT_PATH)
-    existing_files = [f.file_path for f in await list_files_in_branch("main")]
-    commit_actions = []
-    for file_path, file_contents in files_updated.items():
-        commit_actions.append(
-            {
-                "action": "update" if file_path in existing_files else "create",
-                "file_path": file_path,
-                "content": file_contents,
-            }
-        )
+    project = _project()
+    if len(files_updated) > _EXISTENCE_PROBE_LIMIT:
+        existing_files = await list_file_paths_in_branch(mr_target_branch_name)
+    else:
+        exists = await asyncio.gather(*[_file_exists(p, mr_target_branch_name) for p in files_updated])
+        existing_files = {p for p, e in zip(files_updated, exists) if e}
+    commit_actions = (
+        {
+            "action": "update" if file_path in existing_files else "create",
+            "file_path": file_path,
+            "content": file_contents,
+        }
+        for file_path, file_contents in files_updated.items()
+    )
     try:
-        project.commits.create(
+        await _create_commit(
             {
                 "commit_message": commit_message,
                 "author_email": "ai",
                 "author_name": "ai",
-                "actions": commit_actions,
                 "branch": merge_request_branch,
                 "start_branch": mr_target_branch_name,
-            }
+            },
+            commit_actions,
         )
     except Exception as e:
         raise PromptToolError(
@@ -167,16 +357,18 @@ async def create_merge_request(
                 "files_updated": files_updated,
             },
         )
+    _invalidate_branch_cache(merge_request_branch)
 
     try:
-        project.mergerequests.create(
+        await _run(
+            project.mergerequests.create,
             {
                 "source_branch": merge_request_branch,
                 "target_branch": mr_target_branch_name,
                 "title": title,
                 "description": description,
                 "labels": "ai,automerge",
-            }
+            },
         )
     except Exception as e:
         raise PromptToolError(
@@ -194,44 +386,48 @@ async def create_merge_request(
 
 async def approve_merge_request(mr_id: int) -> bool:
     """Approve a merge request."""
-    project = gl.projects.get(settings.GITLAB_HELMFILE_PROJECT_PATH)
-    mr = project.mergerequests.get(mr_id)
-    mr.approve()
+    project = _project()
+    mr = await _run(project.mergerequests.get, mr_id)
+    await _run(mr.approve)
     return True
 
 
-async def get_file_contents(branch: str, file_path: str = "") -> GitlabFile:
-    """Get file contents from repository, branch, and path."""
-    project = gl.projects.get(settings.GITLAB_HELMFILE_PROJECT_PATH)
-    file = project.files.get(file_path=file_path, ref=branch)
-    return GitlabFile(
-        file_path=file.file_path,
-        file_name=file.file_name,
-        size=file.size,
-        encoding=file.encoding,
-        content=file.decode().decode("utf8"),
-        ref=branch,
-        blob_id=getattr(file, "blob_id", None),
-        commit_id=getattr(file, "commit_id", None),
-        last_commit_id=getattr(file, "last_commit_id", None),
-        execute_filemode=getattr(file, "execute_filemode", None),
+async def _afiles_get(path: str, ref: str) -> dict[str, Any]:
+    resp = await get_httpx().get(_project_api_path(f"/repository/files/{quote(path, safe='')}"), params={"ref": ref})
+    _raise_for_status(resp)
+    return resp.json()
+
+
+async def _afiles_head(path: str, ref: str) -> httpx.Response:
+    return await get_httpx().head(_project_api_path(f"/repository/files/{quote(path, safe='')}"), params={"ref": ref})
+
+
+async def get_file_contents(branch: str, file_path: str = "", include_content: bool = True) -> GitlabFile:
+    """Get file contents from repository, branch, and path.
+
+    With `include_content=False` only file metadata is fetched, skipping the download and decoding.
+    """
+    if not include_content:
+        resp = await _afiles_head(file_path, branch)
+        _raise_for_status(resp)
+        metadata = {field: resp.headers.get(header) for field, header in _FILE_METADATA_HEADERS.items()}
+        return GitlabFile.model_validate({**metadata, "ref": branch})
+    file = await _afiles_get(file_path, branch)
+    return GitlabFile.model_validate(
+        {**file, "content": base64.b64decode(file["content"]).decode("utf-8", errors="replace"), "ref": branch}
     )
 
 
 async def list_files_in_merge_request(merge_request_id: int) -> Dict[str, str]:
     """List files in repository for a given branch and path."""
     mr = await get_merge_request_details(merge_request_id)
-    files = {}
-    for f in await list_files_in_branch(mr.source_branch):
-        gl_file = await get_file_contents(mr.source_branch)
-        files[f.file_path] = gl_file.content
-    return files
+    blobs = [f for f in await list_files_in_branch(mr.source_branch) if f.type == "blob"]
+    results = await asyncio.gather(*[get_file_contents(mr.source_branch, f.file_path) for f in blobs])
+    return dict(zip([f.file_path for f in blobs], [r.content for r in results]))
 
 
 class GitlabMergeRequestFactory:
     def __init__(self):
-        gl = gitlab.Gitlab(settings.GITLAB_URL, private_token=settings.GITLAB_TOKEN)
-        self._project = gl.projects.get(settings.GITLAB_HELMFILE_PROJECT_PATH)
         self._source_branch = "main"
         self._mr_branch = None
         self._files = {}
@@ -240,49 +436,43 @@ class GitlabMergeRequestFactory:
         self._files[file_path] = file_contents
 
     async def create_commit_in_branch(self, branch_name: str, commit_message: str):
+        project = _project()
         new_branch = True
         try:
-            self._project.branches.create({"branch": branch_name, "ref": self._source_branch})
+            await _run(project.branches.create, {"branch": branch_name, "ref": self._source_branch})
             logger.info(f"Branch '{branch_name}' created from '{self._source_branch}'")
         except Exception:
             new_branch = False
             logger.info(f"Branch '{branch_name}' already exists")
 
-        existing_files = []
-        for f in self._project.repository_tree(ref=self._source_branch, all=True, recursive=True):
-            path = f.get("path", None)
-            if path and path not in existing_files:
-                existing_files.append(path)
-        if not new_branch:
-            for f in self._project.repository_tree(ref=branch_name, all=True, recursive=True):
-                path = f.get("path", None)
-                if path and path not in existing_files:
-                    existing_files.append(path)
-
-        commit_actions = []
-        for file_path, file_contents in self._files.items():
-            commit_actions.append(
-                {
-                    "action": "update" if file_path in existing_files else "create",
-                    "file_path": file_path,
-                    "content": file_contents,
-                }
-            )
-        commit = self._project.commits.create(
-            {"branch": branch_name, "commit_message": commit_message, "actions": commit_actions}
+        # the commit lands on `branch_name`, so its own tree decides update vs create; a fresh branch equals the
+        # source branch, whose listing is likely cached already
+        existing_files = await list_file_paths_in_branch(self._source_branch if new_branch else branch_name)
+
+        commit_actions = (
+            {
+                "action": "update" if file_path in existing_files else "create",
+                "file_path": file_path,
+                "content": file_contents,
+            }
+            for file_path, file_contents in self._files.items()
         )
-        logger.info(f"Commit created: {commit.id}")
+        commit = await _create_commit({"branch": branch_name, "commit_message": commit_message}, commit_actions)
+        logger.info(f"Commit created: {commit['id']}")
+        _invalidate_branch_cache(branch_name)
         self._mr_branch = branch_name
 
     async def create_merge_request(self, title: str, description: str):
-        mr = self._project.mergerequests.create(
+        project = _project()
+        mr = await _run(
+            project.mergerequests.create,
             {
                 "source_branch": self._mr_branch,
                 "target_branch": self._source_branch,
                 "title": title,
                 "description": description,
                 "remove_source_branch": True,
-            }
+            },
         )
 
         logger.info(f"created: {mr.web_url}")
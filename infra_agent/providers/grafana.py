@@ -10,21 +10,24 @@ from infra_agent.models.grafana import (
     GrafanaNumericResult,
     GrafanaPrometheusQueryOutput,
 )
-from infra_agent.settings import settings
+from infra_agent.settings import get_settings
 
-__grafana_api_headers = {
-    "Authorization": f"Bearer {settings.GRAFANA_API_KEY}",
-    "Accept": "application/json",
-    "Content-Type": "application/json",
-}
+
+def __grafana_api_headers() -> dict[str, str]:
+    return {
+        "Authorization": f"Bearer {get_settings().GRAFANA_API_KEY}",
+        "Accept": "application/json",
+        "Content-Type": "application/json",
+    }
 
 
 async def __get_datasource_id() -> int | None:
+    settings = get_settings()
     url = f"{settings.GRAFANA_URL}api/datasources"
 
     datasources = []
     async with aiohttp.ClientSession() as session:
-        async with session.get(url, headers=__grafana_api_headers) as resp:
+        async with session.get(url, headers=__grafana_api_headers()) as resp:
             text = await resp.text()
             if resp.status != 200:
                 raise RuntimeError(f"Query failed: {resp.status} {text}")
@@ -44,12 +47,12 @@ async def __query_prometheus_range(promql: str, from_s: int, to_s: int) -> Grafa
     step = await __get_step(from_s, to_s)
 
     url = (
-        f"{settings.GRAFANA_URL}api/datasources/proxy/{datasource_id}/api/v1/query_range"
+        f"{get_settings().GRAFANA_URL}api/datasources/proxy/{datasource_id}/api/v1/query_range"
         f"?query={promql}&start={from_s}&end={to_s}&step={step}"
     )
 
     async with aiohttp.ClientSession() as session:
-        async with session.get(url, headers=__grafana_api_headers) as resp:
+        async with session.get(url, headers=__grafana_api_headers()) as resp:
             text = await resp.text()
             if resp.status != 200:
                 raise RuntimeError(f"Query failed: {resp.status} {text}")
@@ -151,7 +154,7 @@ async def get_node_memory_usage(
 #     """List alerts from Grafana API."""
 #     url = f"{settings.GRAFANA_URL}api/annotations?from={_hours_ago_epoch(hours_history)}&type=alert&limit=1000"
 #     async with aiohttp.ClientSession() as session:
-#         async with session.get(url, headers=__grafana_api_headers) as resp:
+#         async with session.get(url, headers=__grafana_api_headers()) as resp:
 #             content = await resp.text()
 #             if resp.status != 200:
 #                 raise PromptToolError(
@@ -1,10 +1,12 @@
 import logging
 from enum import Enum
+from functools import cache, cached_property
 from ipaddress import IPv4Address
+from string import Formatter, Template
 from typing import Optional, Union
 
 from httpx import URL
-from pydantic import AnyUrl, IPvAnyAddress
+from pydantic import AnyUrl, Field, IPvAnyAddress
 from pydantic_settings import BaseSettings
 from yarl import URL as connURL
 
@@ -21,6 +23,22 @@ def get_connection_string(
     return url.human_repr()
 
 
+def format_to_template(fmt: str) -> Template:
+    """Convert a `str.format` style string into an equivalent `string.Template`.
+
+    Escaped braces are resolved once here, so rendering is a plain placeholder substitution.
+    """
+    parts = []
+    for literal, field, spec, conversion in Formatter().parse(fmt):
+        parts.append(literal.replace("$", "$$"))
+        if field is None:
+            continue
+        if spec or conversion or not field.isidentifier():
+            raise ValueError(f"Unsupported replacement field '{field}' in format string")
+        parts.append(f"${{{field}}}")
+    return Template("".join(parts))
+
+
 class AmqpDsn(AnyUrl):
     allowed_schemes = {"amqp"}
     user_required = True
@@ -48,6 +66,7 @@ class Settings(BaseSettings):
     GITLAB_URL: Union[str, URL] = "https://gitlab.com"
     GITLAB_TOKEN: str = ""
     GITLAB_HELMFILE_PROJECT_PATH: str = "test/helmfile"
+    GITLAB_CONCURRENCY: int = Field(16, ge=1)
     GRAFANA_URL: Union[AnyUrl, IPvAnyAddress] = IPv4Address("0.0.0.0")
     GRAFANA_API_KEY: str = ""
     GRAFANA_ORG_ID: int = 1
@@ -159,11 +178,18 @@ You received the following Grafana alert(s):
 Begin by analyzing what they indicate about cluster state and what information you need next.
 """
 
+    @cached_property
+    def GRAFANA_WEBHOOK_SYSTEM_PROMPT_TEMPLATE(self) -> Template:
+        return format_to_template(self.GRAFANA_WEBHOOK_SYSTEM_PROMPT_FORMAT)
+
     class Config:
         env_file = ".env"
         env_file_encoding = "utf-8"
 
 
-settings = Settings()
-
-logging.basicConfig(level=settings.LOG_LEVEL.value, format=settings.LOG_FORMAT)
+@cache
+def get_settings() -> Settings:
+    """Parse settings (and configure logging) on first use rather than at import."""
+    _settings = Settings()
+    logging.basicConfig(level=_settings.LOG_LEVEL.value, format=_settings.LOG_FORMAT)
+    return _settings
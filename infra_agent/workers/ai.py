@@ -1,6 +1,8 @@
 import json
 import logging
-from typing import Any, List
+from functools import cache
+from string import Template
+from typing import Any, Callable, List
 
 from openai import AsyncOpenAI, BadRequestError, RateLimitError
 from ratelimit import limits, sleep_and_retry
@@ -14,19 +16,30 @@ from infra_agent.models.ai import (
 )
 from infra_agent.models.generic import PromptToolError
 from infra_agent.providers.router import closer, tools
-from infra_agent.settings import settings
+from infra_agent.settings import get_settings
 
 logger = logging.getLogger(__name__)
 
 
 async def _load_config() -> AsyncOpenAI:
+    settings = get_settings()
     return AsyncOpenAI(api_key=settings.OPENAI_API_KEY, base_url=settings.OPENAI_API_URL)
 
 
-@sleep_and_retry
-@limits(calls=settings.OPENAI_API_RATE_LIMIT_REQUESTS, period=settings.OPENAI_API_RATE_LIMIT_TIMEWINDOW)
+@cache
+def __rate_limiter() -> Callable[[], None]:
+    settings = get_settings()
+
+    @sleep_and_retry
+    @limits(calls=settings.OPENAI_API_RATE_LIMIT_REQUESTS, period=settings.OPENAI_API_RATE_LIMIT_TIMEWINDOW)
+    def _avoid_ratelimits():
+        pass
+
+    return _avoid_ratelimits
+
+
 def __avoid_ratelimits():
-    pass
+    __rate_limiter()()
 
 
 async def __gpt_query(
@@ -178,7 +191,7 @@ it's result was:
 
 async def gpt_query(
     prompt: str,
-    system_prompt: str | None = None,
+    system_prompt: str | Template | None = None,
     messages: List[OpenAIMessage] = [],
     model: str = "gemini-2.5-flash",
     **kwargs: Any,
@@ -186,7 +199,10 @@ async def gpt_query(
     if not messages and system_prompt:
         system_prompt_kwargs = kwargs
         system_prompt_kwargs["finish_function_name"] = closer.function.name
-        _system_prompt = system_prompt.format(**system_prompt_kwargs)
+        if isinstance(system_prompt, Template):
+            _system_prompt = system_prompt.substitute(**system_prompt_kwargs)
+        else:
+            _system_prompt = system_prompt.format(**system_prompt_kwargs)
         messages.append(OpenAIMessage(role="developer", content=_system_prompt))
         logger.debug(f"System prompt: {_system_prompt}")
     _prompt = prompt.format(**kwargs)